@@ -1,18 +1,35 @@
 import streamlit as st
-import vertexai
-from vertexai.generative_models import GenerativeModel
 import json
-from pypdf import PdfReader
-from google.oauth2 import service_account
-from ics import Calendar, Event, DisplayAlarm
-from datetime import datetime, timedelta # Added timedelta for date math
+import hashlib
+import hmac
+import re
+import string
+import orjson
+import io
+from concurrent.futures import ThreadPoolExecutor
+# Heavy SDKs (vertexai, pypdf, ics, google-auth) are imported lazily inside
+# the functions that use them, so the login screen paints without paying
+# their import cost on every cold rerun.
+from collections import OrderedDict
+from datetime import datetime
+import gc
+
+# Reruns churn out short-lived objects (page texts, prompt strings, ics
+# Events); automatic cyclic GC adds stalls on every click. Collect
+# manually after the heavy operations instead.
+gc.disable()
+
 # --- PASSWORD PROTECTION ---
 def check_password():
     """Returns `True` if the user had the correct password."""
 
     def password_entered():
         """Checks whether a password entered by the user is correct."""
-        if st.session_state["password"] == st.secrets["app_password"]:
+        # Constant-time compare against a prehashed secret: no timing
+        # side channel and no plaintext password kept in secrets.
+        entered = hashlib.sha256(st.session_state["password"].encode()).digest()
+        stored = bytes.fromhex(st.secrets["app_password_sha256"])
+        if hmac.compare_digest(entered, stored):
             st.session_state["password_correct"] = True
             del st.session_state["password"]  # Don't keep password in memory
         else:
@@ -38,26 +55,32 @@ def check_password():
 if not check_password():
     st.stop()
 # --- CONFIGURATION ---
-PROJECT_ID = "cc-claims" 
+PROJECT_ID = "cc-claims"
 LOCATION = "us-central1"
 KEY_PATH = "key.json"
+STAGING_BUCKET = "cc-claims-batch"  # GCS bucket for batch prediction I/O
 
 # --- AUTHENTICATION ---
-try:
+@st.cache_resource
+def init_vertexai():
+    """Authenticate and initialize the Vertex AI SDK (once per process).
+
+    Deferred until the first model call so imports/auth don't block the
+    first paint. Returns the credentials for direct GCS/batch use.
+    """
+    import vertexai
+    from google.oauth2 import service_account
+
     # 1. Try to load from Streamlit Cloud Secrets (Production)
     if "gcp_service_account" in st.secrets:
         # We parse the JSON string we pasted in Secrets
         key_info = json.loads(st.secrets["gcp_service_account"]["info"])
         credentials = service_account.Credentials.from_service_account_info(key_info)
-        vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
-    
     # 2. Try to load from local file (Development/Localhost)
     else:
         credentials = service_account.Credentials.from_service_account_file(KEY_PATH)
-        vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
-
-except Exception as e:
-    st.error(f"Authentication Failed: {e}")
+    vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
+    return credentials
 
 # --- SYSTEM PROMPTS ---
 ANALYST_PROMPT = """
@@ -87,9 +110,58 @@ Return a SINGLE VALID JSON object with this structure:
 Output ONLY the JSON. No markdown.
 """
 
-DRAFTER_PROMPT = """
+# Structured-output schema matching ANALYST_PROMPT; with
+# response_mime_type="application/json" the model returns guaranteed-
+# parseable JSON (no ```json fences, fewer output tokens).
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "metadata": {
+            "type": "object",
+            "properties": {
+                "owner_name": {"type": "string"},
+                "project_name": {"type": "string"},
+                "contract_number": {"type": "string"},
+            },
+        },
+        "clauses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "clause_id": {"type": "string"},
+                    "topic": {"type": "string"},
+                    "trigger_event": {"type": "string"},
+                    "time_limit": {"type": "string"},
+                    "risk_level": {"type": "string"},
+                },
+            },
+        },
+    },
+}
+
+# Static rules live in the system prompt (cacheable across drafts); only
+# the per-notice INPUT DATA block is sent with each request.
+DRAFTER_SYSTEM_PROMPT = """
 ROLE: Expert Construction Claims Consultant (Canada).
-OBJECTIVE: Draft a formal contractual notice.
+OBJECTIVE: Draft a formal contractual notice from the INPUT DATA provided.
+
+RULES:
+1. TONE: Professional, firm, but collaborative. Avoid overly litigious language. Use "Please be advised..."
+2. FORMAT: Standard Business Letter.
+3. STRUCTURE:
+   - Header: the Date
+   - To: the Owner
+   - Attention: the Recipient
+   - Re: Notice of the Topic - Project (Contract #)
+   - Opening: State clearly that on the Date, an issue was identified.
+   - Body Paragraph 1 (The Facts): Describe what happened versus what was in the contract.
+   - Body Paragraph 2 (The Impact): Use bullet points for Schedule/Cost impacts.
+   - Contractual Reference: Cite the Clause as the basis for the notice.
+   - Closing: "We request your direction..." and mention that detailed costs are being tracked.
+"""
+
+DRAFTER_PROMPT = """
 INPUT DATA:
 - Date: {date_str}
 - Owner: {owner}
@@ -97,51 +169,237 @@ INPUT DATA:
 - Project: {project}
 - Contract #: {contract_num}
 - Clause: {clause_id}
+- Topic: {topic}
 - User Cause: {cause}
 - User Effect: {effect}
-
-RULES:
-1. TONE: Professional, firm, but collaborative. Avoid overly litigious language. Use "Please be advised..."
-2. FORMAT: Standard Business Letter.
-3. STRUCTURE:
-   - Header: {date_str}
-   - To: {owner}
-   - Attention: {recipient}
-   - Re: Notice of {topic} - {project} ({contract_num})
-   - Opening: State clearly that on {date_str}, an issue was identified.
-   - Body Paragraph 1 (The Facts): Describe what happened versus what was in the contract.
-   - Body Paragraph 2 (The Impact): Use bullet points for Schedule/Cost impacts.
-   - Contractual Reference: Cite {clause_id} as the basis for the notice.
-   - Closing: "We request your direction..." and mention that detailed costs are being tracked.
 """
 
+# Compiled once at import: Template.substitute fills placeholders at C
+# speed without re-parsing the template on every draft.
+_DRAFTER_TMPL = string.Template(re.sub(r"\{(\w+)\}", r"${\1}", DRAFTER_PROMPT))
+
 # --- HELPER FUNCTIONS ---
-def extract_text_from_pdf(uploaded_file):
+@st.cache_resource
+def get_model(name: str, system_instruction: str = None):
+    """Build the Gemini model once and reuse it across reruns/sessions.
+
+    The static system prompt rides along as a system_instruction so it is
+    never re-sent inline with each contract. (Vertex context caching was
+    considered, but our ~400-token prompts sit far below its minimum
+    cacheable prefix size, and a CachedContent TTL shorter than this
+    resource cache would expire under the model mid-flight.)
+    """
+    from vertexai.generative_models import GenerativeModel
+
+    init_vertexai()
+    if system_instruction:
+        return GenerativeModel(name, system_instruction=system_instruction)
+    return GenerativeModel(name)
+
+
+# Soft ceiling on pages fed to the LLM (replaces the old hard 50-page cut).
+PAGE_LIMIT = 500
+
+def _extract_range(pdf_bytes, start, stop):
+    """Extract pages [start, stop) with a private reader. pypdf readers
+    mutate their stream and resolved-object cache during extraction, so
+    they must never be shared across threads; parsing is lazy, which
+    makes a per-worker reader cheap. The generator join keeps page texts
+    streaming into one final copy, never a growing accumulator."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return "\n".join(page.extract_text() or "" for page in reader.pages[start:stop])
+
+def _pages_parallel(pdf_bytes, start, stop):
+    # Page decoding releases the GIL in pypdf's zlib paths, so threads
+    # give near-linear speedup. Each worker opens its own reader over a
+    # contiguous page range; the final join makes one copy.
+    n = stop - start
+    workers = min(8, n or 1)
+    step = -(-n // workers)  # ceil(n / workers)
+    ranges = [(s, min(s + step, stop)) for s in range(start, stop, step)]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return "\n".join(ex.map(lambda r: _extract_range(pdf_bytes, *r), ranges))
+
+def _pages_chunked(pdf_bytes, n_pages, chunk_size=200):
+    # Decode in bounded chunks so only one chunk's texts are in flight.
+    def chunks():
+        for start in range(0, n_pages, chunk_size):
+            yield _pages_parallel(pdf_bytes, start, min(start + chunk_size, n_pages))
+    return "\n".join(chunks())
+
+# Bounded like the analysis cache: extracted texts can run to MBs for
+# 500-page contracts and must not accumulate for the process lifetime.
+@st.cache_data(max_entries=32, show_spinner=False)
+def extract_text_from_pdf(pdf_hash: str, _pdf_bytes: bytes, page_limit: int = PAGE_LIMIT):
+    # Keyed on the SHA-256 of the file; _pdf_bytes is excluded from hashing.
+    # Parse errors propagate to the caller: Streamlit never caches raised
+    # exceptions, so a bad parse doesn't pin None to this hash.
+    # Readers are stateful (shared stream + object cache), so one is
+    # never cached or shared across sessions/threads; the extracted text
+    # below is the cached artifact, keyed per hash.
+    from pypdf import PdfReader
+
+    n = min(len(PdfReader(io.BytesIO(_pdf_bytes)).pages), page_limit)
+    # Size-tiered routing over page ranges: tiny docs aren't worth pool
+    # overhead, small ones are thread-parallel, bigger ones stream in
+    # bounded chunks. Every tier extracts through private readers.
+    if n <= 10:
+        return _extract_range(_pdf_bytes, 0, n)
+    if n <= 200:
+        return _pages_parallel(_pdf_bytes, 0, n)
+    return _pages_chunked(_pdf_bytes, n)
+
+@st.cache_resource
+def _analyzed_hashes() -> set:
+    """Hashes this process has analyses cached for. Lets the batch path
+    serve known docs from the per-hash disk cache instead of re-batching."""
+    return set()
+
+# Hand-off slot for batch results: seeding a result here and then calling
+# analyze_contract records it in the per-hash disk cache. Module state is
+# reset on each script rerun; entries are consumed within the same run.
+_batch_seed = {}
+
+@st.cache_data(persist="disk", ttl=7 * 24 * 3600, max_entries=256, show_spinner=False)
+def analyze_contract(contract_hash: str, _contract_text: str):
+    # Keyed on the SHA-256 of the PDF so identical uploads skip the LLM
+    # call; persisted to disk so the analysis survives browser refreshes
+    # and server restarts for a week.
+    seeded = _batch_seed.pop(contract_hash, None)
+    if seeded is not None:
+        _analyzed_hashes().add(contract_hash)
+        return seeded
+    model = get_model("gemini-2.0-flash-001", system_instruction=ANALYST_PROMPT)
+    prompt = f"INPUT CONTRACT TEXT:\n{_contract_text}"
     try:
-        reader = PdfReader(uploaded_file)
-        text = ""
-        for i, page in enumerate(reader.pages):
-            if i > 50: break 
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        st.error(f"Error reading PDF: {e}")
-        return None
+        response = model.generate_content(
+            prompt,
+            generation_config={
+                "response_mime_type": "application/json",
+                "response_schema": ANALYSIS_SCHEMA,
+            },
+        )
+        # Failures propagate: Streamlit doesn't cache exceptions, so a
+        # transient Vertex error never lands in the week-long disk cache.
+        result = orjson.loads(response.text)
+        _analyzed_hashes().add(contract_hash)
+        return result
+    finally:
+        gc.collect()  # sweep analysis garbage now, not mid-click later
+
+def _run_analysis_batch(texts):
+    """Submit one Vertex AI batch prediction job for the given texts.
 
-def analyze_contract(contract_text):
-    model = GenerativeModel("gemini-2.0-flash-001") 
-    prompt = f"{ANALYST_PROMPT}\nINPUT CONTRACT TEXT:\n{contract_text}"
+    Returns one result per text, None for slots the job failed to produce
+    (so failures are never cached). Identical texts are submitted once.
+    """
+    from google.cloud import aiplatform, storage
+
+    credentials = init_vertexai()
+    prompts = [f"{ANALYST_PROMPT}\nINPUT CONTRACT TEXT:\n{t}" for t in texts]
+    unique_prompts = list(dict.fromkeys(prompts))
+    result_by_prompt = {}
     try:
-        response = model.generate_content(prompt)
-        clean_json = response.text.replace("```json", "").replace("```", "").strip()
-        return json.loads(clean_json)
+        bucket = storage.Client(project=PROJECT_ID, credentials=credentials).bucket(STAGING_BUCKET)
+        job_id = datetime.now().strftime("batch-%Y%m%d-%H%M%S")
+        generation_config = {
+            "responseMimeType": "application/json",
+            "responseSchema": ANALYSIS_SCHEMA,
+        }
+        lines = [
+            json.dumps({"request": {
+                "contents": [{"role": "user", "parts": [{"text": p}]}],
+                "generationConfig": generation_config,
+            }})
+            for p in unique_prompts
+        ]
+        bucket.blob(f"{job_id}/input.jsonl").upload_from_string("\n".join(lines))
+
+        job = aiplatform.BatchPredictionJob.create(
+            model_name="publishers/google/models/gemini-2.0-flash-001",
+            job_display_name=job_id,
+            gcs_source=f"gs://{STAGING_BUCKET}/{job_id}/input.jsonl",
+            gcs_destination_prefix=f"gs://{STAGING_BUCKET}/{job_id}/output",
+            instances_format="jsonl",
+            predictions_format="jsonl",
+            sync=False,
+        )
+        with st.status(f"Batch analyzing {len(unique_prompts)} contracts on Vertex AI..."):
+            job.wait()
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            st.error(f"Batch analysis failed: {job.state.name}")
+            return [None] * len(texts)
+
+        # Output order is not guaranteed; map each line back via its prompt
+        # (which also fans one reply out to any duplicate uploads).
+        for blob in bucket.list_blobs(prefix=f"{job_id}/output"):
+            if not blob.name.endswith(".jsonl"):
+                continue
+            for line in blob.download_as_text().splitlines():
+                obj = json.loads(line)
+                prompt = obj["request"]["contents"][0]["parts"][0]["text"]
+                reply = obj["response"]["candidates"][0]["content"]["parts"][0]["text"]
+                result_by_prompt[prompt] = orjson.loads(reply)
     except Exception as e:
-        st.error(f"AI Analysis Failed: {e}")
-        return {"metadata": {}, "clauses": []}
+        st.error(f"AI Batch Analysis Failed: {e}")
+    return [result_by_prompt.get(p) for p in prompts]
+
+def analyze_contracts_batch(hashes, texts):
+    """Analyze several contracts in one Vertex AI batch prediction job.
+
+    Batch mode amortizes queueing/scheduling overhead, so it is far cheaper
+    per document than N sync calls. Docs already in the per-hash disk cache
+    skip the job, and fresh batch results are seeded back through
+    analyze_contract so the sync and batch paths share one cache.
+    """
+    results = [None] * len(texts)
+    pending = []
+    for i, (h, t) in enumerate(zip(hashes, texts)):
+        if h in _analyzed_hashes():
+            results[i] = analyze_contract(h, t)  # disk-cache hit, no LLM call
+        else:
+            pending.append(i)
+    if pending:
+        for i, result in zip(pending, _run_analysis_batch([texts[i] for i in pending])):
+            if result is None:
+                # Failed slot: return the fallback but don't cache it,
+                # so the next Analyze click retries this doc.
+                results[i] = {"metadata": {}, "clauses": []}
+                continue
+            results[i] = result
+            _batch_seed[hashes[i]] = result
+            analyze_contract(hashes[i], texts[i])  # records it per hash on disk
+    return results
+
+@st.cache_resource
+def _draft_cache() -> OrderedDict:
+    """Process-wide LRU of finished drafts, keyed by clause + user inputs.
+
+    Users often resubmit identical inputs; cache hits return instantly
+    instead of firing another Vertex call. (st.cache_data can't wrap the
+    streaming generator, so the LRU sits in front of it.)
+    """
+    return OrderedDict()
+
+_DRAFT_CACHE_MAX = 64
+
+def _draft_cache_key(clause, inputs, meta):
+    # Key on every clause field that reaches the prompt: extraction often
+    # emits rows sharing a clause_id with different topics, and those must
+    # not collide on one cached letter.
+    return (
+        clause['clause_id'],
+        clause['topic'],
+        clause.get('trigger_event', ''),
+        tuple(sorted(inputs.items())),
+        tuple(sorted(meta.items())),
+    )
 
 def generate_notice_draft(clause, inputs, meta):
-    model = GenerativeModel("gemini-2.0-flash-001")
-    prompt = DRAFTER_PROMPT.format(
+    model = get_model("gemini-2.0-flash-001", system_instruction=DRAFTER_SYSTEM_PROMPT)
+    prompt = _DRAFTER_TMPL.substitute(
         date_str=inputs['date'],
         owner=meta['owner'],
         recipient=meta['recipient'],
@@ -152,81 +410,88 @@ def generate_notice_draft(clause, inputs, meta):
         cause=inputs['cause'],
         effect=inputs['effect']
     )
-    response = model.generate_content(prompt)
-    return response.text
+    # Stream tokens so the letter renders as it is written; perceived
+    # latency drops from full-completion time to first-token time.
+    response = model.generate_content(prompt, stream=True)
+    for chunk in response:
+        yield chunk.text
 
 # --- UPDATED SMART CALENDAR FUNCTION ---
-def create_calendar_file(clauses):
-    c = Calendar()
-    for item in clauses:
-        e = Event()
-        e.name = f"⚠️ NOTICE DUE: {item['topic']} ({item['clause_id']})"
-        
-        # Smart Logic: Try to find the number of days in the text
-        # If it finds "10", it adds 10 days. Default is 7 days.
-        days_to_add = 7 
-        limit_text = str(item['time_limit']).lower()
-        
-        if "10" in limit_text: days_to_add = 10
-        elif "5" in limit_text: days_to_add = 5
-        elif "3" in limit_text: days_to_add = 3
-        elif "24" in limit_text: days_to_add = 1 # 24 hours = 1 day
-        elif "immediately" in limit_text: days_to_add = 0
-        
-        # Calculate the actual deadline
-        due_date = datetime.now() + timedelta(days=days_to_add)
-        e.begin = due_date
-        
-        # Add rich details to the calendar invite body
-        e.description = f"""
-        PROJECT NOTICE DEADLINE
-        -----------------------
-        Topic: {item['topic']}
-        Clause: {item['clause_id']}
-        Trigger: {item['trigger_event']}
-        Exact Rule: {item['time_limit']}
-        
-        ACTION REQUIRED:
-        Draft and submit notice immediately to preserve claim entitlement.
-        """
-        
-        # Add a pop-up alarm 1 day before the deadline
-        e.alarms.append(DisplayAlarm(trigger=timedelta(days=-1)))
-        
-        c.events.add(e)
-    return c.serialize()
+# One precompiled scan instead of ordered substring checks (which turned
+# "30 days" into 3 days). Matches e.g. "10 Working Days" or "24 hours".
+_TIME_RE = re.compile(r"(\d+)\s*(working day|day|hour|hr)", re.IGNORECASE)
 
-# --- UI ---
-st.set_page_config(page_title="Construction Claims Notification Copilot", layout="wide")
-st.title("Construction Claims Notification Copilot")
+def _clause_deadlines(clauses, base):
+    """Vectorized time-limit parsing: one C-level regex pass over all
+    clauses instead of a per-clause Python scan. Returns due timestamps."""
+    import pandas as pd
 
-# Sidebar
-with st.sidebar:
-    st.header("1. Project Ingestion")
-    uploaded_file = st.file_uploader("Upload Contract (PDF)", type="pdf")
-    
-    if uploaded_file and st.button("Analyze Contract"):
-        with st.spinner("Extracting Project Details & Risks..."):
-            text = extract_text_from_pdf(uploaded_file)
-            if text:
-                data = analyze_contract(text)
-                st.session_state['analysis'] = data
-                st.success("Extraction Complete!")
+    limits = pd.Series([str(item['time_limit']) for item in clauses])
+    parts = limits.str.extract(_TIME_RE)
+    num = pd.to_numeric(parts[0], errors="coerce")
+    is_hours = parts[1].fillna("").str.lower().str.startswith(("hour", "hr"))
+    immediate = limits.str.contains("immediately", case=False)
+    days = num.mask(is_hours, (num // 24).clip(lower=1))  # 24 hours = 1 day
+    days = days.fillna(immediate.map({True: 0, False: 7})).astype(int)
+    return pd.Timestamp(base) + pd.to_timedelta(days, unit="D")
 
-# Main Dashboard
-if 'analysis' in st.session_state:
-    data = st.session_state['analysis']
-    meta = data.get('metadata', {})
-    clauses = data.get('clauses', [])
+def _ics_escape(text):
+    """Escape a value for an iCalendar TEXT property (RFC 5545)."""
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
 
-    # Display Extracted Metadata
-    st.subheader(f"📂 Project: {meta.get('project_name', 'Unknown Project')}")
-    st.caption(f"Owner: {meta.get('owner_name', 'Unknown')} | Contract #: {meta.get('contract_number', 'N/A')}")
-    
-    st.divider()
+# Short TTL: the export embeds "now", so a cached copy must not serve
+# day-old DTSTART/DTSTAMP values on a long-running server.
+@st.cache_data(ttl=3600, show_spinner=False)
+def create_calendar_file(clauses):
+    # Emit VCALENDAR text directly into a StringIO: the output format is
+    # trivial, so there is no need to build and re-serialize the ics
+    # library's Event object graph.
+    # One clock read shared by every deadline (and one datetime allocation
+    # instead of N inside the emit loop).
+    base = datetime.now()
+    due_dates = _clause_deadlines(clauses, base)
+    stamp = f"{base:%Y%m%dT%H%M%SZ}"
+    buf = io.StringIO()
+    buf.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Construction Claims Copilot//EN\r\n")
+    for i, (item, due) in enumerate(zip(clauses, due_dates)):
+        summary = _ics_escape(f"⚠️ NOTICE DUE: {item['topic']} ({item['clause_id']})")
+        # Rich details for the calendar invite body
+        description = _ics_escape(
+            "PROJECT NOTICE DEADLINE\n"
+            "-----------------------\n"
+            f"Topic: {item['topic']}\n"
+            f"Clause: {item['clause_id']}\n"
+            f"Trigger: {item['trigger_event']}\n"
+            f"Exact Rule: {item['time_limit']}\n"
+            "\n"
+            "ACTION REQUIRED:\n"
+            "Draft and submit notice immediately to preserve claim entitlement."
+        )
+        buf.write(
+            "BEGIN:VEVENT\r\n"
+            f"UID:{stamp}-{i}@construction-copilot\r\n"
+            f"DTSTAMP:{stamp}\r\n"
+            f"DTSTART:{due:%Y%m%dT%H%M%SZ}\r\n"
+            f"SUMMARY:{summary}\r\n"
+            f"DESCRIPTION:{description}\r\n"
+            # Pop-up alarm 1 day before the deadline
+            "BEGIN:VALARM\r\n"
+            "ACTION:DISPLAY\r\n"
+            "DESCRIPTION:Notice deadline tomorrow\r\n"
+            "TRIGGER:-P1D\r\n"
+            "END:VALARM\r\n"
+            "END:VEVENT\r\n"
+        )
+    buf.write("END:VCALENDAR\r\n")
+    ics_text = buf.getvalue()
+    gc.collect()  # sweep export garbage now, not mid-click later
+    return ics_text
 
-    # Clause List
-    st.subheader("2. Notification Matrix")
+# --- UI FRAGMENTS ---
+# Fragments scope reruns: interacting with the clause list or the draft
+# form re-executes only that block, not the whole script.
+@st.fragment
+def render_clause_matrix(clauses):
     for index, item in enumerate(clauses):
         with st.expander(f"⚠️ {item['clause_id']}: {item['topic']} ({item['time_limit']})"):
             col1, col2 = st.columns([4, 1])
@@ -236,24 +501,10 @@ if 'analysis' in st.session_state:
                 if st.button("Draft Notice", key=f"btn_{index}"):
                     st.session_state['selected_clause'] = item
                     st.session_state['draft_mode'] = True
+                    st.rerun(scope="app")  # drafting section lives outside this fragment
 
-    # Smart Calendar Export
-    st.markdown("### 📅 Risk Management")
-    if st.button("Download Deadlines to Outlook/Cal (.ics)"):
-        ics_data = create_calendar_file(clauses)
-        st.download_button(
-            label="⬇️ Click to Save Calendar Events",
-            data=ics_data,
-            file_name="project_deadlines.ics",
-            mime="text/calendar"
-        )
-
-# Drafting Section
-if st.session_state.get('draft_mode') and 'selected_clause' in st.session_state:
-    st.divider()
-    target = st.session_state['selected_clause']
-    st.header(f"3. Draft Notice: {target['clause_id']}")
-    
+@st.fragment
+def render_draft_form(target, meta):
     with st.form("draft_form"):
         # Section A: Review Auto-Filled Details
         st.markdown("### Step 1: Confirm Details")
@@ -270,37 +521,120 @@ if st.session_state.get('draft_mode') and 'selected_clause' in st.session_state:
         date_in = st.date_input("Date of Event")
         cause_in = st.text_area("CAUSE (The Facts)", height=100, help="What happened on site?")
         effect_in = st.text_area("EFFECT (Impact)", height=100, help="Is work stopped? Is it costing money?")
-        
+
         if st.form_submit_button("Generate Professional Draft"):
             # Update meta with user inputs
             final_meta = {
-                "owner": owner_in, 
-                "recipient": recipient_in, 
-                "project": proj_in, 
+                "owner": owner_in,
+                "recipient": recipient_in,
+                "project": proj_in,
                 "contract_num": num_in
             }
             inputs = {
-                "cause": cause_in, 
-                "effect": effect_in, 
+                "cause": cause_in,
+                "effect": effect_in,
                 "date": str(date_in)
             }
-            
-            with st.spinner("Drafting letter..."):
-                draft = generate_notice_draft(target, inputs, final_meta)
-                st.session_state['current_draft'] = draft
+
+            cache = _draft_cache()
+            key = _draft_cache_key(target, inputs, final_meta)
+            if key in cache:
+                cache.move_to_end(key)
+                draft = cache[key]
+                st.write(draft)
+            else:
+                st.caption("Drafting letter...")
+                draft = st.write_stream(generate_notice_draft(target, inputs, final_meta))
+                cache[key] = draft
+                if len(cache) > _DRAFT_CACHE_MAX:
+                    cache.popitem(last=False)
+            st.session_state['current_draft'] = draft
 
     # Final Result
     if 'current_draft' in st.session_state:
         st.subheader("4. Final Output")
         draft_text = st.session_state['current_draft']
         st.text_area("Review Draft:", draft_text, height=500)
-        
+
         # Download Button
         st.download_button(
             label="📄 Download as Text File",
             data=draft_text,
             file_name=f"Notice_{target['clause_id']}.txt",
             mime="text/plain"
+        )
+
+# --- UI ---
+st.set_page_config(page_title="Construction Claims Notification Copilot", layout="wide")
+st.title("Construction Claims Notification Copilot")
+
+# Sidebar
+with st.sidebar:
+    st.header("1. Project Ingestion")
+    uploaded_files = st.file_uploader("Upload Contract(s) (PDF)", type="pdf", accept_multiple_files=True)
+
+    if uploaded_files and st.button("Analyze Contract"):
+        with st.spinner("Extracting Project Details & Risks..."):
+            names, hashes, texts = [], [], []
+            for uploaded_file in uploaded_files:
+                pdf_bytes = uploaded_file.getvalue()
+                contract_hash = hashlib.sha256(pdf_bytes).hexdigest()
+                try:
+                    text = extract_text_from_pdf(contract_hash, pdf_bytes)
+                except Exception as e:
+                    st.error(f"Error reading PDF ({uploaded_file.name}): {e}")
+                    continue
+                if text:
+                    names.append(uploaded_file.name)
+                    hashes.append(contract_hash)
+                    texts.append(text)
+            if len(texts) == 1:
+                try:
+                    st.session_state['analyses'] = {names[0]: analyze_contract(hashes[0], texts[0])}
+                    st.success("Extraction Complete!")
+                except Exception as e:
+                    st.error(f"AI Analysis Failed: {e}")
+            elif texts:
+                # Several docs: one batch job instead of N sync calls
+                st.session_state['analyses'] = dict(zip(names, analyze_contracts_batch(hashes, texts)))
+                st.success("Extraction Complete!")
+
+# Main Dashboard
+if st.session_state.get('analyses'):
+    analyses = st.session_state['analyses']
+    if len(analyses) > 1:
+        selected_name = st.selectbox("Contract", list(analyses))
+    else:
+        selected_name = next(iter(analyses))
+    data = analyses[selected_name]
+    meta = data.get('metadata', {})
+    clauses = data.get('clauses', [])
 
+    # Display Extracted Metadata
+    st.subheader(f"📂 Project: {meta.get('project_name', 'Unknown Project')}")
+    st.caption(f"Owner: {meta.get('owner_name', 'Unknown')} | Contract #: {meta.get('contract_number', 'N/A')}")
+    
+    st.divider()
+
+    # Clause List
+    st.subheader("2. Notification Matrix")
+    render_clause_matrix(clauses)
+
+    # Smart Calendar Export
+    st.markdown("### 📅 Risk Management")
+    if st.button("Download Deadlines to Outlook/Cal (.ics)"):
+        ics_data = create_calendar_file(clauses)
+        st.download_button(
+            label="⬇️ Click to Save Calendar Events",
+            data=ics_data,
+            file_name="project_deadlines.ics",
+            mime="text/calendar"
         )
 
+# Drafting Section
+if st.session_state.get('draft_mode') and 'selected_clause' in st.session_state:
+    st.divider()
+    target = st.session_state['selected_clause']
+    st.header(f"3. Draft Notice: {target['clause_id']}")
+    render_draft_form(target, meta)
+